@@ -3,16 +3,27 @@
 Custom Node ComfyUI para upload de pastas para Hugging Face
 """
 
+import errno
+import functools
+import importlib.util
 import os
+import re
 import sys
 import zipfile
+import zlib
 import tempfile
+import shutil
 import subprocess
+import tarfile
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import logging
-from typing import Optional, Tuple, Any
-import torch
+import mmap
+from typing import Optional, Tuple, Any, Dict, Iterator, List, Union
 
 # Configurar logging
 logging.basicConfig(
@@ -21,81 +32,558 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Cache persistente do pip e estado das instalações entre execuções do ComfyUI
+PIP_CACHE_DIR = os.path.expanduser("~/.cache/pip_huggpackreator")
+STATE_DIR = os.path.expanduser("~/.cache/huggpackreator")
 
-def install_dependencies():
-    """Instala as dependências necessárias"""
+# Depois de uma falha, quanto tempo (s) esperar antes de tentar instalar um pacote opcional de novo
+PIP_RETRY_INTERVAL = 24 * 60 * 60
+
+COMPRESS_LEVEL = 6
+ISAL_COMPRESS_LEVEL = 2
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Formatos esperados de repositório ('usuario/nome') e de token ('hf_' + 17+ caracteres)
+_REPO_RE = re.compile(r'[A-Za-z0-9_.-]+/[A-Za-z0-9_.-]+')
+_TOKEN_RE = re.compile(r'hf_[A-Za-z0-9]{17,}')
+
+# Um cliente HfApi por token, reaproveitado entre execuções (evita recriar o cliente
+# e seu executor; a sessão HTTP já é global no huggingface_hub)
+_API_CACHE: Dict[str, Any] = {}
+
+# Uploads em segundo plano, por id da tarefa; um por vez (compactação e rede já usam
+# todos os núcleos/banda). Tarefas concluídas ficam consultáveis por TASK_RETENTION segundos
+_UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hf_upload")
+_UPLOAD_TASKS: Dict[str, Future] = {}
+_TASK_FINISHED_AT: Dict[str, float] = {}
+TASK_RETENTION = 60 * 60
+
+# Arquivos maiores que isso são lidos via mmap em vez de read()
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+# Arquivos maiores que isso são gravados em streaming pela thread principal (memória constante)
+STREAM_THRESHOLD = 64 * 1024 * 1024
+
+# Limite de dados (tamanho de origem) em processamento nas threads antes de gravar
+MAX_PENDING_BYTES = 256 * 1024 * 1024
+
+# Intervalo mínimo (s) entre mensagens de progresso
+PROGRESS_INTERVAL = 1.0
+
+ZSTD_LEVEL = 3
+
+# Extensão do arquivo gerado por tipo de compressão
+ARCHIVE_EXTENSIONS = {
+    "zip": ".zip",
+    "zstd": ".tar.zst"
+}
+
+# Tamanho máximo de cada parte do ZIP (HF recomenda arquivos de 5-10 GB, limite de 50 GB)
+ZIP_PART_SIZE = 5 * 1024**3
+
+# Extensões já comprimidas: DEFLATE só gasta CPU sem reduzir tamanho
+INCOMPRESSIBLE = {
+    '.png', '.jpg', '.jpeg', '.webp', '.safetensors', '.ckpt', '.pt',
+    '.bin', '.zip', '.gz', '.mp4', '.webm'
+}
+
+
+def pip_install(package: str, optional: bool = False) -> bool:
+    """
+    Instala um pacote via pip usando o cache persistente
+    Se um pacote opcional falhar, grava uma sentinela e só tenta de novo após PIP_RETRY_INTERVAL
+    """
+    failed_marker = os.path.join(STATE_DIR, f"{package}.failed")
+    if optional and os.path.exists(failed_marker):
+        remaining = PIP_RETRY_INTERVAL - (time.time() - os.path.getmtime(failed_marker))
+        if remaining > 0:
+            print(f"⚠️  Instalação de {package} falhou recentemente; nova tentativa em {remaining / 3600:.1f}h "
+                  f"(apague {failed_marker} para tentar já)")
+            return False
+    
+    logger.info(f"📦 Instalando {package}...")
+    try:
+        subprocess.check_call([
+            sys.executable, "-m", "pip", "install", package, "--quiet",
+            "--no-input", "--disable-pip-version-check", "--cache-dir", PIP_CACHE_DIR
+        ])
+    except subprocess.CalledProcessError:
+        if not optional:
+            raise
+        os.makedirs(STATE_DIR, exist_ok=True)
+        open(failed_marker, 'w').close()
+        return False
+    
+    if os.path.exists(failed_marker):
+        os.remove(failed_marker)
+    
+    importlib.invalidate_caches()
+    return True
+
+
+def install_dependencies(use_hf_transfer: bool = False, compression: str = "zip"):
+    """Instala as dependências necessárias; retorna HfApi e se o upload rápido ficou ativo"""
     try:
-        from huggingface_hub import HfApi, upload_file
-        return HfApi, upload_file
+        from huggingface_hub import HfApi
     except ImportError:
-        logger.info("📦 Instalando huggingface_hub...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "huggingface_hub", "--quiet"])
-        from huggingface_hub import HfApi, upload_file
-        return HfApi, upload_file
+        pip_install("huggingface_hub")
+        from huggingface_hub import HfApi
+    
+    # Depende do backend disponível (Xet ou hf_transfer)
+    use_hf_transfer = set_hf_transfer(use_hf_transfer)
+    
+    if compression == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            pip_install("zstandard")
+    else:
+        install_isal()
+    
+    return HfApi, use_hf_transfer
 
 
-def find_folder(folder_path: str) -> Optional[str]:
-    """Procura pela pasta, adicionando '/' no início se necessário"""
-    possible_paths = []
+def get_deflate_backend() -> Tuple[Any, int]:
+    """Retorna o módulo DEFLATE (ISA-L se disponível, senão zlib) e o nível de compressão"""
+    try:
+        from isal import isal_zlib
+        return isal_zlib, ISAL_COMPRESS_LEVEL
+    except ImportError:
+        return zlib, COMPRESS_LEVEL
+
+
+def install_isal() -> bool:
+    """Instala o ISA-L (DEFLATE/CRC32 com SIMD); opcional, zlib é usado como fallback"""
+    try:
+        import isal  # noqa: F401
+        return True
+    except ImportError:
+        pass
+    
+    try:
+        if pip_install("isal", optional=True):
+            import isal  # noqa: F401
+            return True
+    except Exception as e:
+        print(f"⚠️  Erro ao instalar isal: {e}")
+    
+    print("⚠️  isal indisponível, usando zlib")
+    return False
+
+
+def set_hf_transfer(enabled: bool) -> bool:
+    """
+    Ativa/desativa o modo de upload de alta velocidade do huggingface_hub
+    Com hf_xet instalado (padrão desde a 0.32) os uploads usam Xet, que ignora
+    hf_transfer; o equivalente é HF_XET_HIGH_PERFORMANCE. Sem Xet, usa hf_transfer (Rust)
+    Retorna se o modo ficou ativo
+    """
+    import huggingface_hub
+    constants = sys.modules.get("huggingface_hub.constants")
+    
+    if importlib.util.find_spec("hf_xet") is not None:
+        if enabled:
+            os.environ["HF_XET_HIGH_PERFORMANCE"] = "1"
+            print("⚡ Xet em modo de alta performance")
+        else:
+            os.environ.pop("HF_XET_HIGH_PERFORMANCE", None)
+        
+        # huggingface_hub lê a variável no import; atualiza caso já tenha sido importado
+        if constants is not None and hasattr(constants, "HF_XET_HIGH_PERFORMANCE"):
+            constants.HF_XET_HIGH_PERFORMANCE = enabled
+        return enabled
+    
+    if int(huggingface_hub.__version__.split(".")[0]) >= 1:
+        # A partir da 1.0 hf_transfer não é mais suportado
+        if enabled:
+            print("⚠️  hf_xet indisponível, usando upload padrão")
+        return False
     
-    if folder_path.startswith('/'):
-        possible_paths.append(folder_path)
+    if enabled:
+        try:
+            import hf_transfer  # noqa: F401
+        except ImportError:
+            try:
+                if not pip_install("hf_transfer", optional=True):
+                    raise ImportError("instalação falhou")
+                import hf_transfer  # noqa: F401
+            except Exception as e:
+                print(f"⚠️  hf_transfer indisponível, usando upload padrão: {e}")
+                enabled = False
+    
+    if enabled:
+        os.environ["HF_HUB_ENABLE_HF_TRANSFER"] = "1"
+        print("⚡ hf_transfer ativado")
     else:
-        possible_paths.append(f"/{folder_path}")
-        possible_paths.append(folder_path)
+        os.environ.pop("HF_HUB_ENABLE_HF_TRANSFER", None)
     
-    possible_paths.extend([
+    # huggingface_hub lê a variável no import; atualiza caso já tenha sido importado
+    if constants is not None and hasattr(constants, "HF_HUB_ENABLE_HF_TRANSFER"):
+        constants.HF_HUB_ENABLE_HF_TRANSFER = enabled
+    
+    return enabled
+
+
+def _candidate_paths(folder_path: str) -> Tuple[str, ...]:
+    """Caminhos onde a pasta pode estar, na ordem de busca"""
+    if os.path.isabs(folder_path):
+        if folder_path.startswith('/workspace'):
+            return (folder_path,)
+        return (folder_path, f"/workspace{folder_path}")
+    
+    return (
+        f"/{folder_path}",
+        folder_path,
         f"./{folder_path}",
         f"../{folder_path}",
-        f"/workspace/{folder_path}" if not folder_path.startswith('/workspace') else folder_path
-    ])
-    
+        f"/workspace/{folder_path}"
+    )
+
+
+@functools.lru_cache(maxsize=128)
+def _resolve(folder_path: str, cwd: str) -> Optional[str]:
+    """Resolve a pasta (memoizado por caminho e diretório atual)"""
+    for path in _candidate_paths(folder_path):
+        if os.path.isdir(path):
+            return os.path.realpath(path)
+    return None
+
+
+def find_folder(folder_path: str) -> Optional[str]:
+    """Procura pela pasta, adicionando '/' no início se necessário"""
     print(f"🔍 Procurando pasta: {folder_path}")
     
-    for path in possible_paths:
-        if os.path.isdir(path):
-            real_path = os.path.realpath(path)
-            print(f"✅ Pasta encontrada: {real_path}")
-            return real_path
+    cwd = os.getcwd()
+    real_path = _resolve(folder_path, cwd)
+    
+    # Resultado em cache pode estar desatualizado (pasta criada/removida depois)
+    if real_path is None or not os.path.isdir(real_path):
+        _resolve.cache_clear()
+        real_path = _resolve(folder_path, cwd)
+    
+    if real_path:
+        print(f"✅ Pasta encontrada: {real_path}")
+        return real_path
     
     print(f"❌ Pasta não encontrada!")
     print("Caminhos tentados:")
-    for path in possible_paths:
+    for path in _candidate_paths(folder_path):
         print(f"  - {path}")
     
     return None
 
 
+def _walk(path: str) -> Iterator[os.DirEntry]:
+    """
+    Percorre a pasta com os.scandir (tipo da entrada vem do readdir, sem stat extra)
+    Gera os arquivos e as pastas vazias; links para pastas não são seguidos
+    """
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                has_children = False
+                for child in _walk(entry.path):
+                    has_children = True
+                    yield child
+                if not has_children:
+                    yield entry
+            elif entry.is_file():
+                yield entry
+
+
+def _drop_page_cache(fd: int):
+    """Libera do page cache as páginas de um arquivo de origem que não será lido de novo"""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def _iter_chunks(file_path: str, drop_cache: bool = False) -> Iterator[Union[bytes, memoryview]]:
+    """
+    Lê o arquivo em blocos de READ_CHUNK_SIZE
+    Arquivos grandes são mapeados com mmap (sem cópia para buffers do Python)
+    """
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        
+        mm = None
+        if file_size > MMAP_THRESHOLD:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                mm = None  # Sistema de arquivos sem suporte (FUSE, rede): usa read()
+        
+        if mm is None:
+            while True:
+                buf = f.read(READ_CHUNK_SIZE)
+                if not buf:
+                    break
+                yield buf
+        else:
+            with mm:
+                if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                
+                with memoryview(mm) as mv:
+                    for offset in range(0, len(mv), READ_CHUNK_SIZE):
+                        length = min(READ_CHUNK_SIZE, len(mv) - offset)
+                        # Acessar páginas além do fim de um arquivo truncado gera SIGBUS
+                        if os.fstat(f.fileno()).st_size < offset + length:
+                            raise OSError(f"Arquivo truncado durante a compactação: {file_path}")
+                        
+                        chunk = mv[offset:offset + length]
+                        try:
+                            yield chunk
+                        finally:
+                            # O mmap só fecha sem views ativas
+                            chunk.release()
+                        # Desmapeia o trecho já lido: o RSS não cresce com o tamanho do arquivo
+                        if hasattr(mmap, 'MADV_DONTNEED'):
+                            mm.madvise(mmap.MADV_DONTNEED, offset, length)
+        
+        if drop_cache:
+            _drop_page_cache(f.fileno())
+
+
+def _deflate_file(file_path: str, arcname: str, backend: Any, level: int) -> Tuple[zipfile.ZipInfo, List[bytes]]:
+    """Comprime um arquivo em memória (executado nas threads de trabalho)"""
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    
+    # wbits negativo = DEFLATE bruto, sem cabeçalho zlib (formato usado no ZIP)
+    compressor = backend.compressobj(level, backend.DEFLATED, -15)
+    chunks = []
+    crc = 0
+    file_size = 0
+    
+    for buf in _iter_chunks(file_path, drop_cache=True):
+        crc = backend.crc32(buf, crc)
+        file_size += len(buf)
+        chunks.append(compressor.compress(buf))
+    chunks.append(compressor.flush())
+    
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = sum(len(chunk) for chunk in chunks)
+    return zinfo, chunks
+
+
+def _crc_file(file_path: str, arcname: str, backend: Any) -> Tuple[zipfile.ZipInfo, None]:
+    """Calcula o CRC32 de um arquivo que será armazenado sem compressão (threads de trabalho)"""
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+    zinfo.compress_type = zipfile.ZIP_STORED
+    crc = 0
+    file_size = 0
+    
+    for buf in _iter_chunks(file_path):
+        crc = backend.crc32(buf, crc)
+        file_size += len(buf)
+    
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = file_size
+    return zinfo, None
+
+
+def _write_stored(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, file_path: str):
+    """Grava uma entrada armazenada copiando os dados dentro do kernel (os.sendfile)"""
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+    
+    zinfo.header_offset = zipf.fp.tell()
+    header = zinfo.FileHeader()
+    zipf.fp.write(header)
+    zipf.fp.flush()
+    data_offset = zinfo.header_offset + len(header)
+    
+    # Reserva o espaço dos dados de uma vez (menos fragmentação; falta de espaço falha antes da cópia)
+    if hasattr(os, 'posix_fallocate') and zinfo.file_size:
+        try:
+            os.posix_fallocate(zipf.fp.fileno(), data_offset, zinfo.file_size)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise
+    
+    with open(file_path, 'rb') as src:
+        offset = 0
+        try:
+            while offset < zinfo.file_size:
+                sent = os.sendfile(zipf.fp.fileno(), src.fileno(), offset, zinfo.file_size - offset)
+                if sent == 0:
+                    raise OSError(f"Arquivo alterado durante a compactação: {file_path}")
+                offset += sent
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                raise
+            # Sistema de arquivos sem suporte a sendfile: copia o restante pelo Python
+            src.seek(offset)
+            zipf.fp.seek(data_offset + offset)
+            shutil.copyfileobj(src, zipf.fp, READ_CHUNK_SIZE)
+        
+        _drop_page_cache(src.fileno())
+    
+    # sendfile avança o descritor por baixo do buffer do Python: reposiciona
+    zipf.fp.seek(data_offset + zinfo.file_size)
+    
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = zipf.fp.tell()
+
+
+def _write_deflated(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, chunks: List[bytes]):
+    """Grava uma entrada já comprimida diretamente no ZIP (mesmo fluxo de ZipFile.write)"""
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+    
+    zinfo.header_offset = zipf.fp.tell()
+    zipf.fp.write(zinfo.FileHeader())
+    for chunk in chunks:
+        zipf.fp.write(chunk)
+    
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = zipf.fp.tell()
+
+
+def _write_streamed(zipf: zipfile.ZipFile, file_path: str, arcname: str, backend: Any, level: int,
+                    compress_type: int):
+    """
+    Grava um arquivo grande lendo-o uma única vez, sem guardá-lo em memória
+    O cabeçalho é reescrito no final com CRC e tamanhos (como no ZipFile.write)
+    """
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+    zinfo.compress_type = compress_type
+    zinfo.CRC = 0
+    zinfo.compress_size = 0
+    zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+    
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+    
+    zinfo.header_offset = zipf.fp.tell()
+    zipf.fp.write(zinfo.FileHeader(zip64))
+    
+    compressor = None
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = backend.compressobj(level, backend.DEFLATED, -15)
+    crc = 0
+    file_size = 0
+    compress_size = 0
+    
+    for buf in _iter_chunks(file_path, drop_cache=True):
+        crc = backend.crc32(buf, crc)
+        file_size += len(buf)
+        if compressor is not None:
+            buf = compressor.compress(buf)
+        zipf.fp.write(buf)
+        compress_size += len(buf)
+    
+    if compressor is not None:
+        tail = compressor.flush()
+        zipf.fp.write(tail)
+        compress_size += len(tail)
+    
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = compress_size
+    if not zip64 and max(file_size, compress_size) > zipfile.ZIP64_LIMIT:
+        raise RuntimeError(f"Arquivo cresceu durante a compactação: {file_path}")
+    
+    end_offset = zipf.fp.tell()
+    zipf.fp.seek(zinfo.header_offset)
+    zipf.fp.write(zinfo.FileHeader(zip64))
+    zipf.fp.seek(end_offset)
+    
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = end_offset
+
+
 def create_zip(folder_path: str, zip_path: str) -> bool:
     """Cria um arquivo ZIP da pasta especificada"""
     try:
         print(f"📦 Compactando pasta: {folder_path}")
         
-        p_folder_path = Path(folder_path)
-        all_files = list(p_folder_path.rglob('*'))
-        total_files = sum(1 for f in all_files if f.is_file())
+        processed_files = 0
+        last_log = time.monotonic()
         
-        if total_files == 0:
-            print("⚠️  A pasta parece estar vazia!")
-            return False
+        backend, level = get_deflate_backend()
+        print(f"⚙️  Compressor: {'ISA-L' if backend is not zlib else 'zlib'}")
         
-        print(f"📊 Total de arquivos a processar: {total_files}")
-        processed_files = 0
+        # Threads comprimem em paralelo (zlib libera o GIL); a thread principal
+        # grava as entradas na ordem de submissão, com no máximo max_pending entradas
+        # e MAX_PENDING_BYTES de dados em processamento
+        max_workers = os.cpu_count() or 1
+        max_pending = max_workers * 2
+        pending = deque()
+        pending_bytes = 0
         
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as zipf:
-            for file_path in all_files:
-                if file_path.is_file():
-                    arcname = file_path.relative_to(p_folder_path)
-                    zipf.write(file_path, arcname)
-                    processed_files += 1
-                    
-                    if processed_files % 50 == 0 or processed_files == total_files:
-                        progress = (processed_files / total_files) * 100
-                        print(f"  ⏳ Progresso ZIP: {progress:.1f}% ({processed_files}/{total_files} arquivos)")
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL, allowZip64=True) as zipf, \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+            
+            # Entradas armazenadas: CRC nas threads e cópia via sendfile, quando disponível
+            use_sendfile = hasattr(os, 'sendfile')
+            
+            def write_next():
+                nonlocal processed_files, last_log, pending_bytes
+                file_path, arcname, compress_type, future, size = pending.popleft()
+                pending_bytes -= size
                 
-                elif file_path.is_dir() and not list(file_path.iterdir()):
-                    arcname = file_path.relative_to(p_folder_path)
+                if compress_type is None:
                     zipf.write(file_path, arcname)
+                    return
+                
+                if future is not None:
+                    zinfo, data = future.result()
+                    if data is None:
+                        _write_stored(zipf, zinfo, file_path)
+                    else:
+                        _write_deflated(zipf, zinfo, data)
+                else:
+                    # Arquivo grande (ou sem sendfile): gravado aqui mesmo, em streaming
+                    _write_streamed(zipf, file_path, arcname, backend, level, compress_type)
+                
+                processed_files += 1
+                now = time.monotonic()
+                if now - last_log >= PROGRESS_INTERVAL:
+                    last_log = now
+                    logger.info(f"  ⏳ Progresso ZIP: {processed_files} arquivos")
+            
+            for entry in _walk(folder_path):
+                arcname = os.path.relpath(entry.path, folder_path)
+                
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, arcname, None, None, 0))
+                    continue
+                
+                size = entry.stat().st_size
+                stored = os.path.splitext(entry.name)[1].lower() in INCOMPRESSIBLE
+                
+                if size > STREAM_THRESHOLD or (stored and not use_sendfile):
+                    # Lido uma única vez pela thread principal
+                    compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+                    pending.append((entry.path, arcname, compress_type, None, 0))
+                elif stored:
+                    # O limite em bytes mantém as páginas lidas no CRC em cache até o sendfile
+                    future = executor.submit(_crc_file, entry.path, arcname, backend)
+                    pending.append((entry.path, arcname, zipfile.ZIP_STORED, future, size))
+                    pending_bytes += size
+                else:
+                    future = executor.submit(_deflate_file, entry.path, arcname, backend, level)
+                    pending.append((entry.path, arcname, zipfile.ZIP_DEFLATED, future, size))
+                    pending_bytes += size
+                
+                while pending and (len(pending) > max_pending or pending_bytes > MAX_PENDING_BYTES):
+                    write_next()
+            
+            while pending:
+                write_next()
+        
+        if processed_files == 0:
+            print("⚠️  A pasta parece estar vazia!")
+            return False
         
         zip_size = os.path.getsize(zip_path) / (1024*1024)
         print(f"✅ ZIP criado com sucesso!")
@@ -108,14 +596,89 @@ def create_zip(folder_path: str, zip_path: str) -> bool:
         return False
 
 
-def upload_to_hf(zip_path: str, repo_id: str, token: str, HfApi, upload_file) -> Optional[str]:
-    """Faz upload do arquivo ZIP para o Hugging Face"""
+def create_tar_zst(folder_path: str, archive_path: str) -> bool:
+    """Cria um .tar.zst da pasta (zstd nível 3, com as threads internas da libzstd)"""
+    try:
+        import zstandard
+        
+        print(f"📦 Compactando pasta (zstd): {folder_path}")
+        
+        processed_files = 0
+        last_log = time.monotonic()
+        
+        def count_file(tarinfo: tarfile.TarInfo) -> tarfile.TarInfo:
+            nonlocal processed_files, last_log
+            if tarinfo.isfile():
+                processed_files += 1
+                now = time.monotonic()
+                if now - last_log >= PROGRESS_INTERVAL:
+                    last_log = now
+                    logger.info(f"  ⏳ Progresso .tar.zst: {processed_files} arquivos")
+            return tarinfo
+        
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+        
+        with open(archive_path, 'wb') as out_fp, compressor.stream_writer(out_fp) as writer, \
+                tarfile.open(fileobj=writer, mode='w|') as tar:
+            for name in sorted(os.listdir(folder_path)):
+                tar.add(os.path.join(folder_path, name), arcname=name, filter=count_file)
+        
+        if processed_files == 0:
+            print("⚠️  A pasta parece estar vazia!")
+            return False
+        
+        archive_size = os.path.getsize(archive_path) / (1024*1024)
+        print(f"✅ Arquivo .tar.zst criado com sucesso!")
+        print(f"📏 Tamanho: {archive_size:.2f} MB")
+        print(f"📄 Arquivos processados: {processed_files}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro ao criar .tar.zst: {e}")
+        return False
+
+
+def create_archive(folder_path: str, archive_path: str, compression: str = "zip") -> bool:
+    """Cria o arquivo compactado no formato escolhido (zip ou zstd)"""
+    if compression == "zstd":
+        return create_tar_zst(folder_path, archive_path)
+    return create_zip(folder_path, archive_path)
+
+
+def split_zip(zip_path: str, part_size: int = ZIP_PART_SIZE) -> List[str]:
+    """
+    Divide o ZIP em partes .001, .002... de no máximo part_size bytes
+    Copia de trás para frente truncando o original, então o espaço extra
+    em disco nunca passa de uma parte
+    """
+    total_size = os.path.getsize(zip_path)
+    num_parts = max(1, -(-total_size // part_size))
+    parts = [f"{zip_path}.{i:03d}" for i in range(1, num_parts + 1)]
+    
+    print(f"✂️  Dividindo ZIP em {num_parts} partes de até {part_size / 1024**3:.0f} GB")
+    
+    with open(zip_path, 'r+b') as src:
+        for i in range(num_parts - 1, 0, -1):
+            offset = i * part_size
+            src.seek(offset)
+            with open(parts[i], 'wb') as dst:
+                shutil.copyfileobj(src, dst, READ_CHUNK_SIZE)
+            src.truncate(offset)
+    
+    os.replace(zip_path, parts[0])
+    return parts
+
+
+def upload_to_hf(zip_path: str, repo_id: str, token: str, HfApi, raise_errors: bool = False) -> Optional[str]:
+    """Faz upload do arquivo ZIP para o Hugging Face (raise_errors repassa a exceção original)"""
     print(f"🚀 Iniciando upload para: {repo_id}")
     
     filename = os.path.basename(zip_path)
     
     try:
-        api = HfApi(token=token)
+        api = _API_CACHE.get(token)
+        if api is None:
+            api = _API_CACHE[token] = HfApi(token=token)
         
         # Verifica/cria repositório
         try:
@@ -129,11 +692,34 @@ def upload_to_hf(zip_path: str, repo_id: str, token: str, HfApi, upload_file) ->
         print(f"📤 Fazendo upload: {filename}")
         print("⏳ Upload em progresso... (pode demorar dependendo do tamanho)")
         
-        url = upload_file(
+        if os.path.getsize(zip_path) > ZIP_PART_SIZE:
+            # Arquivos grandes: várias partes num único commit (evita 413 e o limite de 50 GB)
+            from huggingface_hub import CommitOperationAdd
+            
+            parts = split_zip(zip_path)
+            
+            # O SHA-256 das partes fica para o create_commit (em paralelo) ou para o Xet, durante o upload
+            operations = [
+                CommitOperationAdd(path_in_repo=os.path.basename(part), path_or_fileobj=part)
+                for part in parts
+            ]
+            commit = api.create_commit(
+                repo_id=repo_id,
+                operations=operations,
+                commit_message=f"Upload automático: {filename} ({len(parts)} partes)",
+                repo_type="model"
+            )
+            url = commit.commit_url
+            
+            print(f"✅ Upload concluído com sucesso!")
+            print(f"🧩 Partes: {len(parts)} (junte com: cat {filename}.* > {filename})")
+            print(f"🔗 URL: {url}")
+            return url
+        
+        url = api.upload_file(
             path_or_fileobj=zip_path,
             path_in_repo=filename,
             repo_id=repo_id,
-            token=token,
             repo_type="model",
             commit_message=f"Upload automático: {filename}"
         )
@@ -144,15 +730,78 @@ def upload_to_hf(zip_path: str, repo_id: str, token: str, HfApi, upload_file) ->
         
     except Exception as e:
         print(f"❌ Erro no upload: {e}")
+        if raise_errors:
+            raise
         return None
 
 
+def _run_upload(folder_path: str, zip_filename: str, repo_id: str, token: str,
+                HfApi, compression: str) -> str:
+    """Compacta e faz upload; executado na thread de uploads em segundo plano"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, zip_filename)
+        
+        if not create_archive(folder_path, zip_path, compression):
+            raise RuntimeError("Falha ao criar o arquivo compactado")
+        
+        # Exceções do upload chegam intactas ao nó HuggingFaceUploadStatus
+        return upload_to_hf(zip_path, repo_id, token, HfApi, raise_errors=True)
+
+
+def _evict_finished_tasks():
+    """Remove tarefas concluídas há mais de TASK_RETENTION segundos"""
+    now = time.monotonic()
+    for task_id, finished_at in list(_TASK_FINISHED_AT.items()):
+        if now - finished_at > TASK_RETENTION:
+            _TASK_FINISHED_AT.pop(task_id, None)
+            _UPLOAD_TASKS.pop(task_id, None)
+
+
+def start_background_upload(folder_path: str, zip_filename: str, repo_id: str, token: str,
+                            HfApi, compression: str = "zip") -> str:
+    """Agenda compactação + upload em segundo plano e retorna o id da tarefa na hora"""
+    _evict_finished_tasks()
+    
+    task_id = uuid.uuid4().hex[:12]
+    future = _UPLOAD_EXECUTOR.submit(
+        _run_upload, folder_path, zip_filename, repo_id, token, HfApi, compression
+    )
+    _UPLOAD_TASKS[task_id] = future
+    future.add_done_callback(lambda _: _TASK_FINISHED_AT.__setitem__(task_id, time.monotonic()))
+    return task_id
+
+
+def get_upload_status(task_id: str) -> str:
+    """Consulta o estado de um upload em segundo plano"""
+    _evict_finished_tasks()
+    
+    task_id = task_id.strip()
+    if task_id.startswith("pending: "):
+        task_id = task_id[len("pending: "):]
+    
+    future = _UPLOAD_TASKS.get(task_id)
+    if future is None:
+        return f"❌ Tarefa não encontrada: {task_id}"
+    
+    if not future.done():
+        return f"pending: {task_id}"
+    
+    error = future.exception()
+    if error is not None:
+        return f"❌ Erro no upload: {error}"
+    
+    return str(future.result())
+
+
 def validate_token(token: str) -> bool:
     """Valida o token do Hugging Face"""
     if not token:
         print("❌ Token não fornecido!")
         return False
     
+    if _TOKEN_RE.fullmatch(token):
+        return True
+    
     if not token.startswith("hf_"):
         print("⚠️  Token pode estar inválido (deveria começar com 'hf_')")
     
@@ -168,29 +817,29 @@ def validate_repo(repo: str) -> bool:
         print("❌ Repositório não fornecido!")
         return False
     
+    if _REPO_RE.fullmatch(repo):
+        return True
+    
     if "/" not in repo:
         print("❌ Repositório deve estar no formato 'usuario/nome'")
-        return False
-    
-    parts = repo.split("/")
-    if len(parts) != 2 or not parts[0] or not parts[1]:
+    else:
         print("❌ Formato de repositório inválido!")
-        return False
-    
-    return True
+    return False
 
 
-def generate_zip_name(folder_path: str, custom_name: str = None) -> str:
-    """Gera o nome do arquivo ZIP"""
+def generate_zip_name(folder_path: str, custom_name: str = None, extension: str = ".zip") -> str:
+    """Gera o nome do arquivo ZIP (ou .tar.zst)"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     if custom_name and custom_name.strip():
-        if custom_name.lower().endswith('.zip'):
-            custom_name = custom_name[:-4]
-        return f"{custom_name}_{timestamp}.zip"
+        for known_extension in ARCHIVE_EXTENSIONS.values():
+            if custom_name.lower().endswith(known_extension):
+                custom_name = custom_name[:-len(known_extension)]
+                break
+        return f"{custom_name}_{timestamp}{extension}"
     else:
         folder_name = Path(folder_path).name
-        return f"{folder_name}_{timestamp}.zip"
+        return f"{folder_name}_{timestamp}{extension}"
 
 
 class HuggingFaceUploadNode:
@@ -198,40 +847,54 @@ class HuggingFaceUploadNode:
     Custom Node para fazer upload de pastas para Hugging Face
     """
     
+    # Montado uma vez na definição da classe; o ComfyUI só lê o dicionário
+    _INPUT_TYPES = {
+        "required": {
+            "hf_token": ("STRING", {
+                "multiline": False,
+                "default": "hf_your_token_here"
+            }),
+            "repo_id": ("STRING", {
+                "multiline": False,
+                "default": "usuario/repo"
+            }),
+            "folder_path": ("STRING", {
+                "multiline": False,
+                "default": "/workspace/PACKS_CRIADOS/test/pack/hestia"
+            }),
+            "zip_name": ("STRING", {
+                "multiline": False,
+                "default": ""
+            }),
+            "compression": (list(ARCHIVE_EXTENSIONS), {
+                "default": "zip"
+            }),
+            "use_hf_transfer": ("BOOLEAN", {
+                "default": False
+            }),
+            "run_in_background": ("BOOLEAN", {
+                "default": False
+            }),
+            "trigger_image_1": ("IMAGE",),
+        },
+        "optional": {
+            "trigger_image_2": ("IMAGE",),
+            "trigger_image_3": ("IMAGE",),
+            "trigger_image_4": ("IMAGE",),
+        }
+    }
+    
     @classmethod
     def INPUT_TYPES(cls):
-        return {
-            "required": {
-                "hf_token": ("STRING", {
-                    "multiline": False,
-                    "default": "hf_your_token_here"
-                }),
-                "repo_id": ("STRING", {
-                    "multiline": False,
-                    "default": "usuario/repo"
-                }),
-                "folder_path": ("STRING", {
-                    "multiline": False,
-                    "default": "/workspace/PACKS_CRIADOS/test/pack/hestia"
-                }),
-                "zip_name": ("STRING", {
-                    "multiline": False,
-                    "default": ""
-                }),
-                "trigger_image_1": ("IMAGE",),
-                "trigger_image_2": ("IMAGE",),
-                "trigger_image_3": ("IMAGE",),
-                "trigger_image_4": ("IMAGE",), # <-- ADICIONADO AQUI
-            }
-        }
+        return cls._INPUT_TYPES
     
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("download_url",)
     FUNCTION = "upload_folder"
     CATEGORY = "upload"
     
-    #                                                                                                             e ADICIONADO AQUI -->
-    def upload_folder(self, hf_token, repo_id, folder_path, zip_name, trigger_image_1, trigger_image_2, trigger_image_3, trigger_image_4):
+    def upload_folder(self, hf_token, repo_id, folder_path, zip_name, compression, use_hf_transfer, run_in_background,
+                      trigger_image_1, trigger_image_2=None, trigger_image_3=None, trigger_image_4=None):
         """
         Função principal que executa o upload
         As imagens são apenas triggers, não são usadas
@@ -243,7 +906,7 @@ class HuggingFaceUploadNode:
         
         # Instala dependências
         try:
-            HfApi, upload_file = install_dependencies()
+            HfApi, use_hf_transfer = install_dependencies(use_hf_transfer, compression)
         except Exception as e:
             error_msg = f"❌ Erro ao instalar dependências: {e}"
             print(error_msg)
@@ -262,25 +925,34 @@ class HuggingFaceUploadNode:
             return ("❌ Pasta não encontrada",)
         
         # Gera nome do ZIP
-        zip_filename = generate_zip_name(folder_path, zip_name)
+        zip_filename = generate_zip_name(folder_path, zip_name, ARCHIVE_EXTENSIONS[compression])
         
         print(f"📋 Configurações:")
         print(f"  🗂️  Pasta: {folder_path}")
         print(f"  📦 ZIP: {zip_filename}")
+        print(f"  🗜️  Compressão: {compression}")
         print(f"  🎯 Destino: {repo_id}")
         print(f"  🔑 Token: {hf_token[:10]}...")
+        print(f"  ⚡ hf_transfer: {'sim' if use_hf_transfer else 'não'}")
+        print(f"  🧵 Segundo plano: {'sim' if run_in_background else 'não'}")
         
         # Processa
         try:
+            if run_in_background:
+                # Retorna na hora; acompanhe com o nó HuggingFaceUploadStatus
+                task_id = start_background_upload(folder_path, zip_filename, repo_id, hf_token, HfApi, compression)
+                print(f"🧵 Tarefa: {task_id}")
+                return (f"pending: {task_id}",)
+            
             with tempfile.TemporaryDirectory() as temp_dir:
                 zip_path = os.path.join(temp_dir, zip_filename)
                 
                 # Cria ZIP
-                if not create_zip(folder_path, zip_path):
-                    return ("❌ Falha ao criar ZIP",)
+                if not create_archive(folder_path, zip_path, compression):
+                    return ("❌ Falha ao criar o arquivo compactado",)
                 
                 # Upload
-                upload_url = upload_to_hf(zip_path, repo_id, hf_token, HfApi, upload_file)
+                upload_url = upload_to_hf(zip_path, repo_id, hf_token, HfApi)
                 
                 if upload_url:
                     success_msg = f"✅ Upload concluído! URL: {upload_url}"
@@ -300,11 +972,48 @@ class HuggingFaceUploadNode:
             return (error_msg,)
 
 
+class HuggingFaceUploadStatusNode:
+    """
+    Custom Node para consultar o estado de um upload em segundo plano
+    """
+    
+    _INPUT_TYPES = {
+        "required": {
+            "task_id": ("STRING", {
+                "multiline": False,
+                "default": ""
+            }),
+        }
+    }
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        return cls._INPUT_TYPES
+    
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("status",)
+    FUNCTION = "get_status"
+    CATEGORY = "upload"
+    
+    @classmethod
+    def IS_CHANGED(cls, task_id):
+        # Sempre reexecuta: o estado muda sem que a entrada mude
+        return float("nan")
+    
+    def get_status(self, task_id):
+        """Retorna 'pending: <id>', a URL do upload ou a mensagem de erro"""
+        status = get_upload_status(task_id)
+        print(f"🧵 {status}")
+        return (status,)
+
+
 # Mapeamento dos nós
 NODE_CLASS_MAPPINGS = {
-    "HuggingFaceUploadNode": HuggingFaceUploadNode
+    "HuggingFaceUploadNode": HuggingFaceUploadNode,
+    "HuggingFaceUploadStatus": HuggingFaceUploadStatusNode
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "HuggingFaceUploadNode": "🤗 HuggingFace Upload Packreator"
+    "HuggingFaceUploadNode": "🤗 HuggingFace Upload Packreator",
+    "HuggingFaceUploadStatus": "🤗 HuggingFace Upload Status"
 }